@@ -7,27 +7,53 @@
 import platform
 import sys
 import os
+import io
+import posixpath
+import mmap
 import setuptools  # noqa: F401 # needed because distutils
 import distutils
 import re
+import errno
 import stat
 import shutil
 import tempfile
 import glob
+import time
 import compileall
 import zipfile
+import tarfile
 import hashlib
 import csv
+import json
 import base64
+import copy
+from contextlib import contextmanager
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, Future
 from datetime import datetime
 from pathlib import Path
+from typing import Any, TYPE_CHECKING
 import logging
+if TYPE_CHECKING:
+    from _typeshed import WriteableBuffer
 
-__all__ = ('convert_wheel', 'main')
+__all__ = ('convert_wheel', 'convert_bundle', 'compile_sources',
+           'plan_shards', 'run_shard', 'merge_shards',
+           'aggregate_report', 'main')
 
 
 HASH_ALGORITHM = hashlib.sha256
 
+# Supported wheelhouse bundles and their tarfile compression
+BUNDLE_SUFFIXES = {
+    ".zip":     None,
+    ".tar":     "",
+    ".tar.gz":  "gz",
+    ".tgz":     "gz",
+    ".tar.bz2": "bz2",
+    ".tar.xz":  "xz",
+}
+
 py_implementation = platform.python_implementation()
 # append major & minor version as these versions may change
 # the magic number indicating the pyc file version
@@ -60,8 +86,21 @@ def create_pyc_whl_path(source_whl: Path) -> Path:
 def convert_wheel(whl_file: Path, *,
                   exclude: re.Pattern[str] | str | None = None,
                   with_backup: bool = False, rename: str | bool = False,
-                  quiet: bool = False, optimize: int = 0) -> Path:
-    """Generate a new whl with only pyc files."""
+                  quiet: bool = False, optimize: int = 0,
+                  workdir: Path | None = None, use_mmap: bool = False,
+                  report: Path | None = None, workers: int | None = 1,
+                  compile_stats: Path | None = None) -> Path:
+    """Generate a new whl with only pyc files.
+
+    The wheel is unpacked and rezipped in a temporary directory created in
+    workdir (by default the directory of the converted wheel), so that the
+    new wheel can be atomically renamed into place without copying it.
+    If use_mmap is true, the source wheel is read through a memory map.
+    If report is given, a line with the size changes of the wheel
+    (see aggregate_report()) is appended to it.
+    The py files are compiled by up to workers processes (all CPUs if
+    workers is None or 0), scheduled as by compile_sources().
+    """
 
     if whl_file.suffix != ".whl":
         raise TypeError("File to convert must be a *.whl")
@@ -76,25 +115,30 @@ def convert_wheel(whl_file: Path, *,
 
     dist_info = "-".join(whl_file.stem.split("-")[:-3])
 
-    whl_path = Path(tempfile.mkdtemp())
+    whl_path = Path(tempfile.mkdtemp(prefix=".pyc_wheel-",
+                                     dir=workdir or whl_file.absolute().parent))
+    whl_file_zip = whl_path.with_suffix(".zip")
     try:
         # Extract our zip file temporarily
-        with zipfile.ZipFile(str(whl_file), "r") as whl_zip:
+        with open_wheel(whl_file, use_mmap=use_mmap) as whl_zip:
             whl_zip.extractall(whl_path)
             members = [member for member in whl_zip.infolist()
                        if member.is_dir() or not member.filename.endswith(".py")]
+            if report is not None:
+                input_sizes = _zip_sizes(whl_file, whl_zip.infolist())
 
         # Compile all py files
-        if not compileall.compile_dir(whl_path, rx=exclude,
-                                      ddir=f"<{dist_info}>",
-                                      quiet=int(quiet), force=True, legacy=True,
-                                      optimize=optimize):
+        if not compile_sources(whl_path, exclude=exclude,
+                               ddir=f"<{dist_info}>", name=dist_info.split("-")[0],
+                               quiet=quiet, optimize=optimize,
+                               workers=workers, stats=compile_stats):
             raise RuntimeError(f"Error compiling Python sources in wheel {whl_file.name}")
 
         # Remove all original py files
         for py_file in whl_path.glob("**/*.py"):
             if py_file.is_file():  # pragma: no branch
-                if exclude is None or not exclude.search(str(py_file)):
+                if exclude is None or not exclude.search(
+                        py_file.relative_to(whl_path).as_posix()):
                     if not quiet: print(f"Deleting py file: {py_file}")
                     py_file.chmod(stat.S_IWUSR)
                     py_file.unlink()
@@ -103,7 +147,8 @@ def convert_wheel(whl_file: Path, *,
             for fname in files:
                 if fname.endswith(".py"):  # pragma: no cover
                     py_file = Path(root)/fname
-                    if exclude is None or not exclude.search(str(py_file)):
+                    if exclude is None or not exclude.search(
+                            py_file.relative_to(whl_path).as_posix()):
                         if not quiet: print(f"Removing file: {py_file}")
                         py_file.chmod(stat.S_IWUSR)
                         py_file.unlink()
@@ -122,17 +167,19 @@ def convert_wheel(whl_file: Path, *,
                 pass  # ignore errors
 
         dist_info_path = whl_path/f"{dist_info}.dist-info"
-        rewrite_dist_info(dist_info_path, exclude=exclude)
+        packages = rewrite_dist_info(dist_info_path, exclude=exclude)
 
         # Rezip the file with the new version info
-        whl_file_zip = whl_path.with_suffix(".zip")
         if whl_file_zip.exists(): whl_file_zip.unlink()
         shutil.make_archive(str(whl_path), "zip", root_dir=str(whl_path))
+        if report is not None:
+            with zipfile.ZipFile(str(whl_file_zip), "r") as whl_zip:
+                output_sizes = _zip_sizes(whl_file_zip, whl_zip.infolist())
         if with_backup:
-            whl_file.replace(whl_file.with_suffix(whl_file.suffix + ".bak"))
+            backup_file(whl_file, whl_file.with_suffix(whl_file.suffix + ".bak"))
         if rename:
             pyc_whl_path = create_pyc_whl_path(whl_file)
-            shutil.move(whl_file_zip, pyc_whl_path)
+            replace_file(whl_file_zip, pyc_whl_path)
             if whl_file != pyc_whl_path:  # pragma: no branch
                 whl_file.unlink(missing_ok=True)
                 if rename == "symlink":
@@ -141,16 +188,598 @@ def convert_wheel(whl_file: Path, *,
                                     f"{whl_file} -> {pyc_whl_path}")
             whl_file = pyc_whl_path
         else:
-            shutil.move(whl_file_zip, whl_file)
+            replace_file(whl_file_zip, whl_file)
+        if report is not None:
+            # A single write per line keeps concurrent appends whole
+            line = json.dumps({"wheel": whl_file.name, "input": input_sizes,
+                               "output": output_sizes, "packages": packages},
+                              separators=(",", ":"))
+            with report.open("a", newline="\n") as report_file:
+                report_file.write(line + "\n")
         return whl_file
     finally:
         # Clean up original directory
         shutil.rmtree(str(whl_path), ignore_errors=True)
+        whl_file_zip.unlink(missing_ok=True)
+
+
+def compile_sources(src_path: Path, *, ddir: str, name: str = "",
+                    exclude: re.Pattern[str] | None = None,
+                    quiet: bool = False, optimize: int = 0,
+                    workers: int | None = 1, stats: Path | None = None) -> bool:
+    """Compile all py files under src_path to legacy pyc files.
+
+    Like compileall.compile_dir(), but the files are scheduled longest first,
+    and exclude is searched for in the file paths relative to src_path,
+    so that a few huge modules do not finish last on a single worker.
+    The cost of a file is its compilation time recorded in the stats file
+    (JSON, keyed by the distribution name and the file path relative to
+    src_path, e.g. 'name/pkg/mod.py') by previous runs, or otherwise its
+    size scaled by the average recorded compilation speed.
+    If stats is given, the timings of this run are merged into it under
+    a lock, so it can be shared by concurrent conversions.
+    Return True if all files were compiled successfully.
+    """
+    sources = []
+    for root, dirs, files in os.walk(src_path):
+        dirs[:] = sorted(dname for dname in dirs if dname != "__pycache__")
+        for fname in sorted(files):
+            if not fname.endswith(".py"): continue
+            py_file = Path(root)/fname
+            rel_path = py_file.relative_to(src_path)
+            if exclude is not None and exclude.search(rel_path.as_posix()): continue
+            sources.append((py_file, rel_path))
+
+    def stats_key(rel_path: Path) -> str:
+        return f"{name}/{rel_path.as_posix()}" if name else rel_path.as_posix()
+
+    timings: dict[str, dict[str, float]] = {}
+    if stats is not None and stats.exists():
+        with stats.open("r") as stats_file:
+            timings = json.load(stats_file)
+    total_size = sum(timing["size"] for timing in timings.values())
+    total_time = sum(timing["time"] for timing in timings.values())
+    speed = total_time / total_size if total_size and total_time else 1.0
+
+    def cost(source: tuple[Path, Path]) -> float:
+        timing = timings.get(stats_key(source[1]))
+        return timing["time"] if timing else source[0].stat().st_size * speed
+
+    sources.sort(key=lambda source: (-cost(source), source[1].as_posix()))
+
+    args_list = [(str(py_file), str(Path(ddir)/rel_path.parent), quiet, optimize)
+                 for py_file, rel_path in sources]
+    if workers == 1 or len(sources) <= 1:
+        results = [_compile_file(*args) for args in args_list]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or None) as executor:
+            futures = [executor.submit(_compile_file, *args) for args in args_list]
+            results = [future.result() for future in futures]
+
+    if stats is not None:
+        new_timings = {stats_key(rel_path): {"size": py_file.stat().st_size, "time": elapsed}
+                       for (py_file, rel_path), (success, elapsed) in zip(sources, results)
+                       if success}
+        with _locked(stats.with_name(stats.name + ".lock")):
+            # Re-read, as the stats may have been updated in the meantime
+            timings = {}
+            if stats.exists():
+                with stats.open("r") as stats_file:
+                    timings = json.load(stats_file)
+            timings.update(new_timings)
+            stats_new = stats.with_name(f".{stats.name}.{os.getpid()}.new")
+            with stats_new.open("w", newline="\n") as stats_file:
+                json.dump(timings, stats_file, indent=2, sort_keys=True)
+            replace_file(stats_new, stats)
+
+    return all(success for success, _ in results)
+
+
+@contextmanager
+def _locked(lock_file: Path) -> Iterator[None]:
+    """Hold an exclusive lock on lock_file (created if needed)."""
+    with lock_file.open("a") as lock:
+        if sys.platform == "win32":  # pragma: no cover
+            import msvcrt
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 attempts
+                    pass
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def _compile_file(fullname: str, ddir: str, quiet: bool, optimize: int) -> tuple[bool, float]:
+    start = time.perf_counter()
+    success = compileall.compile_file(fullname, ddir=ddir, quiet=int(quiet), force=True,
+                                      legacy=True, optimize=optimize)
+    return bool(success), time.perf_counter() - start
+
+
+def aggregate_report(report: Path) -> dict[str, Any]:
+    """Sum up the lines of a conversion report.
+
+    Each report line (JSON) describes one converted wheel:
+    'input' and 'output' hold the size of the wheel file and the total
+    compressed and uncompressed size of its members, and 'packages' holds,
+    for each top-level package, the py bytes removed and the pyc bytes
+    added according to the rewritten RECORD. The aggregate has the same
+    layout, with 'wheel' set to None and the number of wheels in 'wheels'.
+    Only the lines after the last aggregate line already present in the
+    report (i.e. the current batch run) are summed up.
+    """
+    def new_total() -> dict[str, Any]:
+        return {"wheel": None, "wheels": 0,
+                "input":  dict.fromkeys(("size", "compressed", "uncompressed"), 0),
+                "output": dict.fromkeys(("size", "compressed", "uncompressed"), 0),
+                "packages": {}}
+
+    total = new_total()
+    with report.open("r") as report_file:
+        for line in report_file:
+            if not line.strip(): continue
+            entry = json.loads(line)
+            if entry["wheel"] is None:
+                total = new_total()
+                continue
+            total["wheels"] += 1
+            for key in ("input", "output"):
+                for name, value in entry[key].items():
+                    total[key][name] += value
+            for package, sizes in entry["packages"].items():
+                package_total = total["packages"].setdefault(
+                    package, dict.fromkeys(("py_removed", "pyc_added"), 0))
+                for name, value in sizes.items():
+                    package_total[name] += value
+    return total
+
+
+def _zip_sizes(zip_file: Path, members: list[zipfile.ZipInfo]) -> dict[str, int]:
+    return {"size": zip_file.stat().st_size,
+            "compressed":   sum(member.compress_size for member in members),
+            "uncompressed": sum(member.file_size for member in members)}
+
+
+def convert_bundle(bundle_file: Path, output_file: Path | None = None, *,
+                   exclude: re.Pattern[str] | str | None = None,
+                   with_backup: bool = False, rename: str | bool = False,
+                   quiet: bool = False, optimize: int = 0,
+                   workdir: Path | None = None, use_mmap: bool = False,
+                   report: Path | None = None, workers: int | None = 1,
+                   compile_stats: Path | None = None, jobs: int | None = 1) -> Path:
+    """Convert all wheels in a wheelhouse bundle (*.zip or *.tar[.gz|.bz2|.xz]).
+
+    The bundle members are extracted one by one and each inner wheel is
+    converted (in up to jobs worker processes, all CPUs if jobs is None or 0)
+    as soon as it is extracted. The output bundle is written in the original
+    member order. Members other than wheels are copied unchanged.
+    """
+    compression = bundle_compression(bundle_file)
+    if output_file is None: output_file = bundle_file
+    if isinstance(exclude, str): exclude = re.compile(exclude) if exclude else None
+    # The old names of renamed wheels are not kept in the bundle;
+    # instead, the links to renamed wheels in tar bundles are updated.
+    if rename == "symlink": rename = True
+
+    bundle_path = Path(tempfile.mkdtemp(prefix=".pyc_wheel-",
+                                        dir=workdir or output_file.absolute().parent))
+    bundle_file_new = bundle_path.with_suffix(".new")
+    executor: ProcessPoolExecutor | None = None
+    try:
+        if jobs != 1: executor = ProcessPoolExecutor(max_workers=jobs or None)
+        converted: dict[Path, Path | Future[Path]] = {}
+
+        def convert(whl_file: Path) -> None:
+            options: dict[str, Any] = dict(exclude=exclude, rename=rename, quiet=quiet,
+                                           optimize=optimize, use_mmap=use_mmap,
+                                           report=report, workers=workers,
+                                           compile_stats=compile_stats)
+            if executor is None:
+                converted[whl_file] = convert_wheel(whl_file, **options)
+            else:
+                converted[whl_file] = executor.submit(convert_wheel, whl_file, **options)
+
+        # Extract the bundle members and convert the inner wheels
+        zip_members: list[tuple[zipfile.ZipInfo, Path | None]] = []
+        tar_members: list[tuple[tarfile.TarInfo, Path | None]] = []
+        if compression is None:
+            with open_wheel(bundle_file, use_mmap=use_mmap) as bundle_zip:
+                for zinfo in bundle_zip.infolist():
+                    if zinfo.is_dir():
+                        zip_members.append((zinfo, None))
+                        continue
+                    file_path = _bundle_member_path(bundle_path, zinfo.filename)
+                    with bundle_zip.open(zinfo) as zsrc, file_path.open("wb") as fdst:
+                        shutil.copyfileobj(zsrc, fdst)
+                    zip_members.append((zinfo, file_path))
+                    if file_path.suffix == ".whl": convert(file_path)
+        else:
+            with tarfile.open(str(bundle_file), "r|*") as bundle_tar:
+                for tinfo in bundle_tar:
+                    if not tinfo.isfile():
+                        tar_members.append((tinfo, None))
+                        continue
+                    file_path = _bundle_member_path(bundle_path, tinfo.name)
+                    tsrc = bundle_tar.extractfile(tinfo)
+                    assert tsrc is not None
+                    with tsrc, file_path.open("wb") as fdst:
+                        shutil.copyfileobj(tsrc, fdst)
+                    tar_members.append((tinfo, file_path))
+                    if file_path.suffix == ".whl": convert(file_path)
+
+        converted_map = {whl_file: (result.result() if isinstance(result, Future) else result)
+                         for whl_file, result in converted.items()}
+
+        def converted_member(arcname: str, file_path: Path) -> tuple[str, Path]:
+            if file_path not in converted_map: return arcname, file_path
+            file_path = converted_map[file_path]
+            return str(Path(arcname).with_name(file_path.name).as_posix()), file_path
+
+        # Write the output bundle
+        if compression is None:
+            with zipfile.ZipFile(str(bundle_file_new), "w") as bundle_zip:
+                for zinfo, zip_file_path in zip_members:
+                    if zip_file_path is None:
+                        bundle_zip.writestr(_copy_zipinfo(zinfo, zinfo.filename), b"")
+                        continue
+                    arcname, file_path = converted_member(zinfo.filename, zip_file_path)
+                    new_zinfo = _copy_zipinfo(zinfo, arcname)
+                    with (file_path.open("rb") as fsrc,
+                          bundle_zip.open(new_zinfo, "w", force_zip64=(
+                              file_path.stat().st_size > zipfile.ZIP64_LIMIT)) as zdst):
+                        shutil.copyfileobj(fsrc, zdst)
+        else:
+            with tarfile.open(str(bundle_file_new),  # type: ignore[call-overload]
+                              f"w:{compression}") as bundle_tar:
+                for tinfo, tar_file_path in tar_members:
+                    if tar_file_path is None:
+                        bundle_tar.addfile(_converted_link(tinfo, bundle_path,
+                                                           converted_map))
+                        continue
+                    arcname, file_path = converted_member(tinfo.name, tar_file_path)
+                    new_tinfo = copy.copy(tinfo)
+                    new_tinfo.name = arcname
+                    new_tinfo.size = file_path.stat().st_size
+                    new_tinfo.pax_headers = {key: value
+                                             for key, value in tinfo.pax_headers.items()
+                                             if key not in ("path", "size")}
+                    with file_path.open("rb") as fsrc:
+                        bundle_tar.addfile(new_tinfo, fsrc)
+
+        if with_backup and output_file.exists():
+            backup_file(output_file, output_file.with_name(output_file.name + ".bak"))
+        replace_file(bundle_file_new, output_file)
+        if not quiet: print(f"Converted bundle: {bundle_file} -> {output_file}")
+        return output_file
+    finally:
+        if executor is not None: executor.shutdown(cancel_futures=True)
+        # Clean up the extracted bundle
+        shutil.rmtree(str(bundle_path), ignore_errors=True)
+        bundle_file_new.unlink(missing_ok=True)
+
+
+def _converted_link(tinfo: tarfile.TarInfo, bundle_path: Path,
+                    converted_map: dict[Path, Path]) -> tarfile.TarInfo:
+    """Return tinfo with its link target updated if it points to a renamed wheel."""
+    if tinfo.issym():
+        link_dir = posixpath.dirname(tinfo.name)
+        target = posixpath.normpath(posixpath.join(link_dir, tinfo.linkname))
+    elif tinfo.islnk():
+        target = posixpath.normpath(tinfo.linkname)
+    else:
+        return tinfo
+    converted_path = converted_map.get(bundle_path/target)
+    if converted_path is None:
+        return tinfo
+    new_tinfo = copy.copy(tinfo)
+    new_tinfo.linkname = posixpath.join(posixpath.dirname(tinfo.linkname),
+                                        converted_path.name)
+    new_tinfo.pax_headers = {key: value for key, value in tinfo.pax_headers.items()
+                             if key != "linkpath"}
+    return new_tinfo
+
+
+def _copy_zipinfo(zinfo: zipfile.ZipInfo, arcname: str) -> zipfile.ZipInfo:
+    """Return a copy of the metadata of a zip member, stored under arcname."""
+    new_zinfo = zipfile.ZipInfo(arcname, zinfo.date_time)
+    new_zinfo.compress_type = zinfo.compress_type
+    new_zinfo.create_system = zinfo.create_system
+    new_zinfo.external_attr = zinfo.external_attr
+    new_zinfo.comment       = zinfo.comment
+    return new_zinfo
+
+
+def plan_shards(whl_files: Iterable[Path], manifest_file: Path, shards: int) -> Path:
+    """Write a manifest splitting the wheels into shards of similar work.
+
+    The work of a wheel is the size of its py files, read from the central
+    directory of the wheel. The wheels are assigned largest first to the
+    least loaded shard, so the manifest is deterministic for a given set
+    of wheels. Wheel paths are stored relative to the manifest directory.
+    """
+    if shards < 1:
+        raise ValueError("The number of shards must be at least 1")
+
+    manifest_dir = manifest_file.resolve().parent
+    wheels: list[dict[str, Any]] = []
+    for whl_file in whl_files:
+        if whl_file.suffix != ".whl":
+            raise TypeError("File to convert must be a *.whl")
+        with zipfile.ZipFile(str(whl_file), "r") as whl_zip:
+            py_bytes = sum(zinfo.file_size for zinfo in whl_zip.infolist()
+                           if zinfo.filename.endswith(".py"))
+        path = Path(os.path.relpath(whl_file.resolve(), manifest_dir)).as_posix()
+        wheels.append({"path": path, "py_bytes": py_bytes})
+
+    wheels.sort(key=lambda wheel: (-wheel["py_bytes"], wheel["path"]))
+    loads = [0] * shards
+    for wheel in wheels:
+        shard = min(range(shards), key=lambda idx: (loads[idx], idx))
+        wheel["shard"] = shard + 1
+        loads[shard] += wheel["py_bytes"]
+    wheels.sort(key=lambda wheel: (wheel["shard"], wheel["path"]))
+
+    with manifest_file.open("w", newline="\n") as manifest:
+        json.dump({"shards": shards, "wheels": wheels}, manifest, indent=2)
+        manifest.write("\n")
+    return manifest_file
+
+
+def run_shard(manifest_file: Path, shard: tuple[int, int], *,
+              exclude: re.Pattern[str] | str | None = None,
+              with_backup: bool = False, rename: str | bool = False,
+              quiet: bool = False, optimize: int = 0,
+              workdir: Path | None = None, use_mmap: bool = False,
+              report: Path | None = None, workers: int | None = 1,
+              compile_stats: Path | None = None) -> Path:
+    """Convert the wheels of the shard (index counted from 1, count) of the manifest.
+
+    The result of each conversion is appended to the shard log (JSON lines)
+    as soon as it is known; a failed conversion does not stop the shard.
+    """
+    manifest = _load_manifest(manifest_file)
+    index, count = shard
+    if count != manifest["shards"] or not 1 <= index <= count:
+        raise ValueError(f"Shard {index}/{count} does not match the manifest "
+                         f"with {manifest['shards']} shards")
+    manifest_dir = manifest_file.resolve().parent
+
+    log_file = shard_log_path(manifest_file, index, count)
+    with log_file.open("w", newline="\n") as log:
+        for wheel in manifest["wheels"]:
+            if wheel["shard"] != index: continue
+            result = {"path": wheel["path"]}
+            try:
+                pyc_whl_file = convert_wheel(manifest_dir/wheel["path"], exclude=exclude,
+                                             with_backup=with_backup, rename=rename,
+                                             quiet=quiet, optimize=optimize,
+                                             workdir=workdir, use_mmap=use_mmap,
+                                             report=report, workers=workers,
+                                             compile_stats=compile_stats)
+            except Exception as exc:
+                result.update(status="failed", error=f"{type(exc).__name__}: {exc}")
+            else:
+                output = Path(os.path.relpath(pyc_whl_file.resolve(), manifest_dir))
+                result.update(status="ok", output=output.as_posix())
+            log.write(json.dumps(result) + "\n")
+            log.flush()
+    return log_file
+
+
+def merge_shards(manifest_file: Path) -> list[dict[str, str]]:
+    """Merge the shard logs of the manifest and return the unsuccessful results.
+
+    The merged log is written next to the manifest. A wheel without any
+    result in the shard logs is reported with the 'missing' status.
+    """
+    manifest = _load_manifest(manifest_file)
+    count = manifest["shards"]
+
+    results: dict[str, dict[str, str]] = {}
+    for index in range(1, count + 1):
+        log_file = shard_log_path(manifest_file, index, count)
+        if not log_file.exists(): continue
+        with log_file.open("r") as log:
+            for line in log:
+                if not line.strip(): continue
+                result = json.loads(line)
+                results[result["path"]] = result
+
+    merged = [results.get(wheel["path"], {"path": wheel["path"], "status": "missing"})
+              for wheel in manifest["wheels"]]
+    merged_file = manifest_file.with_name(f"{manifest_file.stem}-merged.jsonl")
+    with merged_file.open("w", newline="\n") as log:
+        for result in merged:
+            log.write(json.dumps(result) + "\n")
+    return [result for result in merged if result["status"] != "ok"]
+
+
+def shard_log_path(manifest_file: Path, index: int, count: int) -> Path:
+    """Return the path of the result log of a shard of the manifest."""
+    return manifest_file.with_name(f"{manifest_file.stem}-shard-{index}-of-{count}.jsonl")
+
+
+def shard_spec(value: str) -> tuple[int, int]:
+    """Parse a shard specification 'I/N' (I counted from 1)."""
+    index, sep, count = value.partition("/")
+    if not sep or not 1 <= int(index) <= int(count):
+        raise ValueError(f"Invalid shard specification: {value}")
+    return int(index), int(count)
+
+
+def positive_int(value: str) -> int:
+    """Parse a positive integer."""
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"Not a positive integer: {value}")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    """Parse a non-negative integer."""
+    number = int(value)
+    if number < 0:
+        raise ValueError(f"Not a non-negative integer: {value}")
+    return number
+
+
+def _load_manifest(manifest_file: Path) -> dict[str, Any]:
+    with manifest_file.open("r") as manifest:
+        return dict(json.load(manifest))
+
+
+def bundle_compression(bundle_file: Path) -> str | None:
+    """Return the tarfile compression of a bundle (None for a zip bundle)."""
+    name = bundle_file.name.lower()
+    for suffix, compression in BUNDLE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return compression
+    raise TypeError("Bundle to convert must be a *.zip or *.tar[.gz|.bz2|.xz]")
+
+
+def _bundle_member_path(bundle_path: Path, member_name: str) -> Path:
+    """Return the extraction path of a bundle member (refusing to leave bundle_path)."""
+    member_path = Path(member_name)
+    if member_path.is_absolute() or ".." in member_path.parts:
+        raise ValueError(f"Unsafe member path in bundle: {member_name}")
+    file_path = bundle_path/member_path
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    return file_path
+
+
+@contextmanager
+def open_wheel(whl_file: Path, *, use_mmap: bool = False) -> Iterator[zipfile.ZipFile]:
+    """Open a wheel for reading, optionally through a read-only memory map.
+
+    With use_mmap the wheel is read from the page cache (shared between
+    processes reading the same wheel) without read() system calls; the
+    member data is still copied out of the mapping, as zipfile needs bytes.
+    """
+    if not use_mmap or whl_file.stat().st_size == 0:
+        with zipfile.ZipFile(str(whl_file), "r") as whl_zip:
+            yield whl_zip
+        return
+    with (whl_file.open("rb") as whl_fd,
+          mmap.mmap(whl_fd.fileno(), 0, access=mmap.ACCESS_READ) as whl_map):
+        with zipfile.ZipFile(_MappedFile(whl_map), "r") as whl_zip:
+            yield whl_zip
+
+
+class _MappedFile(io.RawIOBase):
+    """Read-only seekable file object over a memory map."""
+
+    def __init__(self, mapping: mmap.mmap) -> None:
+        super().__init__()
+        self._map = mapping
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        try:
+            self._map.seek(offset, whence)  # type: ignore[arg-type]
+        except ValueError as exc:
+            # zipfile expects OSError (e.g. for a truncated wheel)
+            raise OSError(errno.EINVAL, str(exc)) from None
+        return self._map.tell()
+
+    def tell(self) -> int:
+        return self._map.tell()
+
+    def read(self, size: int | None = -1) -> bytes:
+        return self._map.read(size)
+
+    def readinto(self, buffer: "WriteableBuffer") -> int:  # pragma: no cover
+        with memoryview(buffer) as view:
+            data = self._map.read(view.nbytes)
+            view.cast("B")[:len(data)] = data
+        return len(data)
+
+
+def backup_file(src_file: Path, bak_file: Path) -> None:
+    """Preserve src_file as bak_file without copying its content.
+
+    A hardlink or a reflink (copy-on-write clone) is tried first, so that
+    src_file stays in place until it is atomically replaced; otherwise
+    src_file is simply renamed to bak_file.
+    """
+    bak_file.unlink(missing_ok=True)
+    try:
+        os.link(src_file, bak_file)
+    except (OSError, AttributeError):  # pragma: no cover
+        try:
+            _reflink(src_file, bak_file)
+        except OSError:
+            src_file.replace(bak_file)
+
+
+def replace_file(src_file: Path, dst_file: Path) -> None:
+    """Atomically move src_file to dst_file."""
+    try:
+        os.replace(src_file, dst_file)
+    except OSError as exc:  # pragma: no cover
+        if exc.errno != errno.EXDEV: raise
+        _replace_file_across_fs(src_file, dst_file)
+
+
+def _replace_file_across_fs(src_file: Path, dst_file: Path) -> None:  # pragma: no cover
+    """Copy (reflink if possible) src_file next to dst_file and rename it
+    into place, so dst_file is never left partially written."""
+    fd, tmp_name = tempfile.mkstemp(prefix=".pyc_wheel-", suffix=".tmp",
+                                    dir=dst_file.parent)
+    os.close(fd)
+    tmp_file = Path(tmp_name)
+    try:
+        try:
+            _reflink(src_file, tmp_file)
+        except OSError:
+            shutil.copy2(src_file, tmp_file)
+        os.replace(tmp_file, dst_file)
+        src_file.unlink()
+    finally:
+        tmp_file.unlink(missing_ok=True)
+
+
+def _reflink(src_file: Path, dst_file: Path) -> None:  # pragma: no cover
+    """Clone src_file to dst_file with the FICLONE ioctl (Linux only)."""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+    FICLONE = 0x40049409  # _IOW(0x94, 9, int)
+    try:
+        with open(src_file, "rb") as fsrc, open(dst_file, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src_file, dst_file)
+    except OSError:
+        dst_file.unlink(missing_ok=True)
+        raise
 
 
 def rewrite_dist_info(dist_info_path: Path, *,
-                      exclude: re.Pattern[str] | str | None = None) -> None:
-    """Rewrite the record file with pyc files instead of py files."""
+                      exclude: re.Pattern[str] | str | None = None
+                      ) -> dict[str, dict[str, int]]:
+    """Rewrite the record file with pyc files instead of py files.
+
+    Return the py bytes removed and the pyc bytes added for each top-level
+    package, according to the record file.
+    """
 
     whl_path = dist_info_path.resolve().parent
 
@@ -162,6 +791,7 @@ def rewrite_dist_info(dist_info_path: Path, *,
     record_path.chmod(stat.S_IWUSR | stat.S_IRUSR)
 
     record_data = []
+    packages: dict[str, dict[str, int]] = {}
     with record_path.open("r") as record:
         for file_dest, file_hash, file_len in csv.reader(record):
             if file_dest.endswith(".py"):
@@ -183,6 +813,11 @@ def rewrite_dist_info(dist_info_path: Path, *,
                             data = f.read()
                         hash_obj = HASH_ALGORITHM(data)
                         file_hash = f"{hash_obj.name}={_b64encode(hash_obj.digest())}"
+                        package = packages.setdefault(
+                            _top_level_name(fpath_dest),
+                            dict.fromkeys(("py_removed", "pyc_added"), 0))
+                        package["py_removed"] += int(file_len or 0)
+                        package["pyc_added"]  += len(data)
                         file_len  = str(len(data))
                     else: pass  # pragma: no cover
             record_data.append((file_dest, file_hash, file_len))
@@ -234,6 +869,22 @@ def rewrite_dist_info(dist_info_path: Path, *,
             else:
                 wheel.write(line)
 
+    return packages
+
+
+def _top_level_name(file_path: Path) -> str:
+    """Return the top-level package (or module) name of a file in a wheel.
+
+    Files of the other {name}.data schemes (scripts, data, headers) are not
+    in packages and are reported under '<scheme>' (e.g. '<scripts>').
+    """
+    parts = file_path.parts
+    if len(parts) >= 3 and parts[0].endswith(".data"):
+        if parts[1] not in ("purelib", "platlib"):
+            return f"<{parts[1]}>"
+        parts = parts[2:]  # {name}.data/{purelib|platlib}/...
+    return parts[0] if len(parts) > 1 else Path(parts[0]).stem
+
 
 def _get_platform() -> str:  # pragma: no cover # not used for now
     """Return our platform name 'win32', 'linux_x86_64'"""
@@ -255,12 +906,15 @@ def main(argv: list[str] = sys.argv[1:]) -> int:
     from argparse import ArgumentParser
     app_name = __package__
     parser = ArgumentParser(prog=f"python -m {app_name}", description=main.__doc__)
-    parser.add_argument("whl_file",
-                        help="Path (can contain wildcards) to whl(s) to convert")
+    parser.add_argument("whl_file", nargs="?",
+                        help="Path (can contain wildcards) to whl(s) to convert "
+                             "or to wheelhouse bundle(s) (*.zip, *.tar[.gz|.bz2|.xz]) "
+                             "whose wheels are to be converted")
     parser.add_argument("--exclude", default=None,
                         help="skip files matching the regular expression; "
-                             "the regexp is searched for in the full path "
-                             "of each file considered for compilation")
+                             "the regexp is searched for in the path (relative "
+                             "to the wheel root, with '/' separators) of each "
+                             "file considered for compilation")
     parser.add_argument("--with_backup", "--with-backup", default=False, action="store_true",
                         help="Indicates whether the backup will be created.")
     rename_group = parser.add_mutually_exclusive_group()
@@ -271,6 +925,41 @@ def main(argv: list[str] = sys.argv[1:]) -> int:
                                   const="symlink",
                                   help="Rename the wheel to python version and symlink "
                                        "old name to new.")
+    parser.add_argument("--workdir", default=None, type=Path,
+                        help="Directory for temporary files. Defaults to the "
+                             "directory of each wheel, which allows the converted "
+                             "wheel to be renamed into place without copying.")
+    parser.add_argument("--mmap", dest="use_mmap", default=False, action="store_true",
+                        help="Read the source wheels through a memory map.")
+    parser.add_argument("--jobs", "-j", default=1, type=non_negative_int,
+                        help="Number of worker processes converting the wheels "
+                             "of a bundle (0 means the number of CPUs).")
+    parser.add_argument("--plan", metavar="MANIFEST", default=None, type=Path,
+                        help="Do not convert, but write a manifest splitting "
+                             "the wheels into --shards shards balanced by the "
+                             "size of their py files.")
+    parser.add_argument("--shards", default=1, type=positive_int,
+                        help="Number of shards of the --plan manifest.")
+    parser.add_argument("--manifest", default=None, type=Path,
+                        help="Convert the wheels of the --shard of the manifest "
+                             "written by --plan and log the results next to it.")
+    parser.add_argument("--shard", metavar="I/N", default=None, type=shard_spec,
+                        help="Shard of the --manifest to convert (I counted from 1).")
+    parser.add_argument("--merge", metavar="MANIFEST", default=None, type=Path,
+                        help="Merge the shard logs of the manifest and report "
+                             "the failed or missing conversions.")
+    parser.add_argument("--report", default=None, type=Path,
+                        help="Append to the report (JSON lines) the size changes "
+                             "of each converted wheel, followed by their aggregate "
+                             "(with --manifest the aggregate is appended by --merge).")
+    parser.add_argument("--workers", default=1, type=non_negative_int,
+                        help="Number of worker processes compiling the py files "
+                             "of a wheel, largest first (0 means the number of CPUs).")
+    parser.add_argument("--compile-stats", "--compile_stats", dest="compile_stats",
+                        default=None, type=Path,
+                        help="File (JSON) of compilation timings which is used "
+                             "to schedule the compilation and updated with the "
+                             "timings of this run.")
     parser.add_argument("--optimize", default=0, type=int, choices=[0, 1, 2],
                         help="Specifies the optimization level of the compiler."
                              "Explicit levels are 0 (no optimization; __debug__ is true),"
@@ -289,8 +978,74 @@ def main(argv: list[str] = sys.argv[1:]) -> int:
     logging.basicConfig(format="[%(levelname)s]:%(message)s",
                         level=getattr(logging, args.log.upper()))
 
+    modes = [option for option, value in (("--plan", args.plan),
+                                           ("--manifest", args.manifest),
+                                           ("--merge", args.merge)) if value is not None]
+    if len(modes) > 1:
+        parser.error(f"{modes[0]} cannot be used with {modes[1]}")
+    if args.shard is not None and args.manifest is None:
+        parser.error("--shard requires --manifest")
+    if args.whl_file is not None and (args.manifest is not None or args.merge is not None):
+        parser.error(f"{modes[0]} takes the wheels from the manifest "
+                     "and cannot be used with whl_file")
+
+    if args.merge is not None:
+        failures = merge_shards(args.merge)
+        _write_aggregate_report(args.report)
+        for result in failures:
+            print(f"{result['status']}: {result['path']} {result.get('error', '')}".rstrip(),
+                  file=sys.stderr)
+        return 1 if failures else 0
+    if args.manifest is not None:
+        if args.shard is None:
+            parser.error("--manifest requires --shard")
+        run_shard(args.manifest, args.shard, exclude=args.exclude,
+                  with_backup=args.with_backup, rename=args.rename,
+                  quiet=args.quiet, optimize=args.optimize,
+                  workdir=args.workdir, use_mmap=args.use_mmap,
+                  report=args.report, workers=args.workers,
+                  compile_stats=args.compile_stats)
+        return 0
+    if args.whl_file is None:
+        parser.error("the following arguments are required: whl_file")
+    if args.plan is not None:
+        for option, dest, default in (("--exclude", "exclude", None),
+                                      ("--with-backup", "with_backup", False),
+                                      ("--rename/--symlink", "rename", False),
+                                      ("--workdir", "workdir", None),
+                                      ("--mmap", "use_mmap", False),
+                                      ("--jobs", "jobs", 1),
+                                      ("--report", "report", None),
+                                      ("--workers", "workers", 1),
+                                      ("--compile-stats", "compile_stats", None),
+                                      ("--optimize", "optimize", 0)):
+            if getattr(args, dest) != default:
+                parser.error(f"--plan does not convert wheels and cannot be used with {option}")
+        plan_shards((Path(whl_file) for whl_file in sorted(glob.iglob(args.whl_file))),
+                    args.plan, args.shards)
+        return 0
+
     for whl_file in glob.iglob(args.whl_file):
+        if whl_file.lower().endswith(tuple(BUNDLE_SUFFIXES)):
+            convert_bundle(Path(whl_file), exclude=args.exclude,
+                           with_backup=args.with_backup, rename=args.rename,
+                           quiet=args.quiet, optimize=args.optimize,
+                           workdir=args.workdir, use_mmap=args.use_mmap,
+                           report=args.report, workers=args.workers,
+                           compile_stats=args.compile_stats, jobs=args.jobs)
+            continue
         convert_wheel(Path(whl_file), exclude=args.exclude,
                       with_backup=args.with_backup, rename=args.rename,
-                      quiet=args.quiet, optimize=args.optimize)
+                      quiet=args.quiet, optimize=args.optimize,
+                      workdir=args.workdir, use_mmap=args.use_mmap,
+                      report=args.report, workers=args.workers,
+                      compile_stats=args.compile_stats)
+    _write_aggregate_report(args.report)
     return 0
+
+
+def _write_aggregate_report(report: Path | None) -> None:
+    if report is None or not report.exists(): return
+    line = json.dumps(aggregate_report(report), separators=(",", ":"))
+    with report.open("a", newline="\n") as report_file:
+        report_file.write(line + "\n")
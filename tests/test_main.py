@@ -2,11 +2,18 @@
 # SPDX-License-Identifier: MIT
 
 import unittest
+from unittest import mock
 import sys
 import os
 from pathlib import Path
 import tempfile
 import shutil
+import zipfile
+import json
+import io
+import contextlib
+import tarfile
+import mmap
 import platform
 
 import pyc_wheel
@@ -43,11 +50,272 @@ class MainTestCase(unittest.TestCase):
         self.assertTrue(whl_file.exists())
         self.assertTrue(whl_file_bak.exists())
 
+    def test_workdir(self):
+        whl_file = self.data_dir/"renumerate-1.3.5-py3-none-any.whl"
+        workdir = Path(tempfile.mkdtemp(prefix="pyc_wheel_work_"))
+        try:
+            main([str(whl_file), "--quiet", "--workdir", str(workdir)])
+            self.assertTrue(whl_file.exists())
+            self.assertEqual(list(workdir.iterdir()), [])
+        finally:
+            self.rmdir(workdir)
+
+    def test_mmap(self):
+        whl_file = self.data_dir/"slownie-1.4.5-py3-none-any.whl"
+        with mock.patch("mmap.mmap", wraps=mmap.mmap) as mmap_mock:
+            main([str(whl_file), "--quiet", "--mmap"])
+        mmap_mock.assert_called_once()
+        self.assertTrue(whl_file.exists())
+        with zipfile.ZipFile(whl_file) as whl_zip:
+            self.assertFalse(any(name.endswith(".py") for name in whl_zip.namelist()))
+
+    def test_bundle_zip(self):
+        bundle_file = self.data_dir/"wheelhouse.zip"
+        with zipfile.ZipFile(bundle_file, "w") as bundle_zip:
+            bundle_zip.writestr("wheelhouse/", b"")
+            for name in ("renumerate-1.3.5-py3-none-any.whl", "let3-1.2.3-py3-none-any.whl"):
+                bundle_zip.write(data_dir/name, f"wheelhouse/{name}")
+            zinfo = zipfile.ZipInfo("wheelhouse/requirements.txt", (2020, 1, 2, 3, 4, 6))
+            zinfo.external_attr = 0o600 << 16
+            bundle_zip.writestr(zinfo, "renumerate\nlet3\n")
+        main([str(bundle_file), "--quiet", "--jobs", "2"])
+        with zipfile.ZipFile(bundle_file) as bundle_zip:
+            self.assertEqual(bundle_zip.namelist(),
+                             ["wheelhouse/",
+                              "wheelhouse/renumerate-1.3.5-py3-none-any.whl",
+                              "wheelhouse/let3-1.2.3-py3-none-any.whl",
+                              "wheelhouse/requirements.txt"])
+            zinfo = bundle_zip.getinfo("wheelhouse/requirements.txt")
+            self.assertEqual(zinfo.date_time, (2020, 1, 2, 3, 4, 6))
+            self.assertEqual(zinfo.external_attr >> 16, 0o600)
+            with zipfile.ZipFile(bundle_zip.open(bundle_zip.namelist()[1])) as whl_zip:
+                self.assertFalse(any(name.endswith(".py") for name in whl_zip.namelist()))
+
+    @unittest.skipUnless(py_implementation.lower() in ("cpython", "pypy"),
+                         "Only for CPython or PyPy")
+    def test_bundle_tar(self):
+        py_tag_prefix = "cp" if self.is_cpython else "pp"
+        bundle_file = self.data_dir/"wheelhouse.tar.gz"
+        bundle_file_bak = self.data_dir/"wheelhouse.tar.gz.bak"
+        with tarfile.open(bundle_file, "w:gz") as bundle_tar:
+            tinfo = tarfile.TarInfo("wh")
+            tinfo.type = tarfile.DIRTYPE
+            bundle_tar.addfile(tinfo)
+            bundle_tar.add(data_dir/"slownie-1.4.5-py3-none-any.whl",
+                           "wh/slownie-1.4.5-py3-none-any.whl")
+            tinfo = tarfile.TarInfo("wh/latest.whl")
+            tinfo.type = tarfile.SYMTYPE
+            tinfo.linkname = "slownie-1.4.5-py3-none-any.whl"
+            bundle_tar.addfile(tinfo)
+            tinfo = tarfile.TarInfo("wh/slownie.whl")
+            tinfo.type = tarfile.LNKTYPE
+            tinfo.linkname = "wh/slownie-1.4.5-py3-none-any.whl"
+            bundle_tar.addfile(tinfo)
+        main([str(bundle_file), "--quiet", "--rename", "--with-backup"])
+        self.assertTrue(bundle_file_bak.exists())
+        whl_name = f"slownie-1.4.5-{py_tag_prefix}{py_version}-none-any.whl"
+        with tarfile.open(bundle_file, "r:gz") as bundle_tar:
+            self.assertEqual(bundle_tar.getnames(),
+                             ["wh", f"wh/{whl_name}", "wh/latest.whl", "wh/slownie.whl"])
+            self.assertTrue(bundle_tar.getmember("wh").isdir())
+            symlink = bundle_tar.getmember("wh/latest.whl")
+            self.assertTrue(symlink.issym())
+            self.assertEqual(symlink.linkname, whl_name)
+            hardlink = bundle_tar.getmember("wh/slownie.whl")
+            self.assertTrue(hardlink.islnk())
+            self.assertEqual(hardlink.linkname, f"wh/{whl_name}")
+
+    def test_bundle_invalid_jobs(self):
+        bundle_file = self.data_dir/"wheelhouse_jobs.zip"
+        with zipfile.ZipFile(bundle_file, "w") as bundle_zip:
+            bundle_zip.write(data_dir/"let3-1.2.3-py3-none-any.whl",
+                             "let3-1.2.3-py3-none-any.whl")
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            main([str(bundle_file), "--jobs", "-1"])
+        with self.assertRaises(ValueError):
+            pyc_wheel.convert_bundle(bundle_file, jobs=-1)
+        self.assertEqual(list(self.data_dir.glob(".pyc_wheel-*")), [])
+
+    def test_bundle_invalid_suffix(self):
+        with self.assertRaisesRegex(TypeError, "Bundle to convert must be .+"):
+            pyc_wheel.convert_bundle(self.data_dir/"wheelhouse.rar")
+
+    def test_shards(self):
+        mirror_dir = self.data_dir/"mirror"
+        self.mkdir(mirror_dir)
+        for name in ("renumerate-1.3.5-py3-none-any.whl", "slownie-1.4.5-py3-none-any.whl",
+                     "let3-1.2.3-py3-none-any.whl", "pkg_about-1.3.7-py3-none-any.whl"):
+            shutil.copy2(data_dir/name, mirror_dir/name)
+        shutil.copy2(data_dir/"annotate-1.2.4-py3-none-any_not_compilable.whl",
+                     mirror_dir/"annotate-1.2.4-py3-none-any.whl")
+        manifest_file = self.data_dir/"manifest.json"
+        main([str(mirror_dir/"*.whl"), "--plan", str(manifest_file), "--shards", "2"])
+        manifest = manifest_file.read_text()
+        main([str(mirror_dir/"*.whl"), "--plan", str(manifest_file), "--shards", "2"])
+        self.assertEqual(manifest_file.read_text(), manifest)
+        manifest = json.loads(manifest)
+        self.assertEqual(len(manifest["wheels"]), 5)
+        self.assertEqual({wheel["shard"] for wheel in manifest["wheels"]}, {1, 2})
+
+        main(["--manifest", str(manifest_file), "--shard", "1/2", "--quiet"])
+        self.assertEqual(main(["--merge", str(manifest_file)]), 1)
+        main(["--manifest", str(manifest_file), "--shard", "2/2", "--quiet"])
+        failures = pyc_wheel.merge_shards(manifest_file)
+        self.assertEqual([(result["path"], result["status"]) for result in failures],
+                         [("mirror/annotate-1.2.4-py3-none-any.whl", "failed")])
+        self.assertTrue((self.data_dir/"manifest-merged.jsonl").exists())
+
+        with self.assertRaisesRegex(ValueError, "Shard 1/3 does not match .+"):
+            pyc_wheel.run_shard(manifest_file, (1, 3))
+
+        for argv in (["--shards", "0"], ["--shards", "-1"], ["--workers", "2"],
+                     ["--report", str(self.data_dir/"plan_report.jsonl")]):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                main([str(mirror_dir/"*.whl"), "--plan", str(manifest_file), *argv])
+        for argv in ([str(mirror_dir/"*.whl"), "--shard", "1/2"],
+                     [str(mirror_dir/"*.whl"), "--manifest", str(manifest_file),
+                      "--shard", "1/2"],
+                     [str(mirror_dir/"*.whl"), "--merge", str(manifest_file)],
+                     ["--merge", str(manifest_file), "--plan", str(manifest_file)],
+                     ["--manifest", str(manifest_file), "--shard", "1/2",
+                      "--plan", str(manifest_file)]):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                main(argv)
+
+    def test_report(self):
+        report_dir = self.data_dir/"report"
+        self.mkdir(report_dir)
+        for name in ("renumerate-1.3.5-py3-none-any.whl", "let3-1.2.3-py3-none-any.whl"):
+            shutil.copy2(data_dir/name, report_dir/name)
+        report_file = self.data_dir/"report.jsonl"
+        main([str(report_dir/"*.whl"), "--quiet", "--report", str(report_file)])
+        entries = [json.loads(line) for line in report_file.read_text().splitlines()]
+        self.assertEqual(len(entries), 3)
+        *wheels, total = entries
+        self.assertEqual(sorted(entry["wheel"] for entry in wheels),
+                         ["let3-1.2.3-py3-none-any.whl",
+                          "renumerate-1.3.5-py3-none-any.whl"])
+        self.assertIn("renumerate", wheels[0]["packages"] | wheels[1]["packages"])
+        for entry in wheels:
+            self.assertEqual(entry["output"]["size"],
+                             (report_dir/entry["wheel"]).stat().st_size)
+            for sizes in entry["packages"].values():
+                self.assertGreater(sizes["py_removed"], 0)
+                self.assertGreater(sizes["pyc_added"], 0)
+        self.assertIsNone(total["wheel"])
+        self.assertEqual(total["wheels"], 2)
+        self.assertEqual(total["input"]["size"],
+                         sum(entry["input"]["size"] for entry in wheels))
+        # The report is appended to and each aggregate covers its own run
+        main([str(report_dir/"let3-1.2.3-py3-none-any.whl"), "--quiet",
+              "--report", str(report_file)])
+        entries = [json.loads(line) for line in report_file.read_text().splitlines()]
+        self.assertEqual(len(entries), 5)
+        self.assertEqual(entries[2], total)
+        self.assertEqual(entries[4]["wheels"], 1)
+
+    def test_report_data_scheme(self):
+        whl_file = self.data_dir/"datapkg-1.0-py3-none-any.whl"
+        files = {"datapkg-1.0.data/purelib/mod.py": "x = 1\n",
+                 "datapkg-1.0.data/purelib/pkg/__init__.py": "y = 2\n",
+                 "datapkg-1.0.data/scripts/tool.py": "z = 3\n",
+                 "datapkg-1.0.dist-info/METADATA": "Name: datapkg\nVersion: 1.0\n",
+                 "datapkg-1.0.dist-info/WHEEL": "Wheel-Version: 1.0\nTag: py3-none-any\n"}
+        with zipfile.ZipFile(whl_file, "w") as whl_zip:
+            for name, data in files.items():
+                whl_zip.writestr(name, data)
+            whl_zip.writestr("datapkg-1.0.dist-info/RECORD", "".join(
+                f"{name},,{len(data)}\n" for name, data in files.items())
+                + "datapkg-1.0.dist-info/RECORD,,\n")
+        report_file = self.data_dir/"report_data.jsonl"
+        main([str(whl_file), "--quiet", "--report", str(report_file)])
+        entry = json.loads(report_file.read_text().splitlines()[0])
+        self.assertEqual(set(entry["packages"]), {"mod", "pkg", "<scripts>"})
+        self.assertEqual(entry["packages"]["mod"]["py_removed"], 6)
+
+    def test_workers(self):
+        workers_dir = self.data_dir/"workers"
+        self.mkdir(workers_dir)
+        whl_file = workers_dir/"renumerate-1.3.5-py3-none-any.whl"
+        shutil.copy2(data_dir/whl_file.name, whl_file)
+        stats_file = self.data_dir/"compile_stats.json"
+        main([str(whl_file), "--quiet", "--workers", "2",
+              "--compile-stats", str(stats_file)])
+        self.assertTrue(whl_file.exists())
+        self.assertIn("renumerate/renumerate/__init__.py", json.loads(stats_file.read_text()))
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            main([str(whl_file), "--workers", "-1"])
+
+    def test_compile_stats_concurrent(self):
+        bundle_file = self.data_dir/"wheelhouse_stats.zip"
+        names = ("renumerate-1.3.5-py3-none-any.whl", "let3-1.2.3-py3-none-any.whl",
+                 "slownie-1.4.5-py3-none-any.whl", "pkg_about-1.3.7-py3-none-any.whl")
+        with zipfile.ZipFile(bundle_file, "w") as bundle_zip:
+            for name in names:
+                bundle_zip.write(data_dir/name, name)
+        stats_file = self.data_dir/"compile_stats_concurrent.json"
+        main([str(bundle_file), "--quiet", "--jobs", "4",
+              "--compile-stats", str(stats_file)])
+        self.assertEqual({key.split("/")[0] for key in json.loads(stats_file.read_text())},
+                         {name.split("-")[0] for name in names})
+
+    def test_compile_sources_order(self):
+        src_path = Path(tempfile.mkdtemp(prefix="pyc_wheel_src_"))
+        try:
+            (src_path/"pkg").mkdir()
+            (src_path/"pkg"/"small.py").write_text("x = 1\n")
+            (src_path/"pkg"/"large.py").write_text("x = 1\n" * 1000)
+            (src_path/"other.py").write_text("x = 1\n" * 10)
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertTrue(pyc_wheel.compile_sources(src_path, ddir="<pkg>"))
+            self.assertEqual([line.split()[1].strip("'.") for line in stdout.getvalue()
+                              .splitlines() if line.startswith("Compiling")],
+                             [str(src_path/"pkg"/"large.py"), str(src_path/"other.py"),
+                              str(src_path/"pkg"/"small.py")])
+            self.assertTrue((src_path/"pkg"/"large.pyc").exists())
+            # Recorded timings take precedence over the file sizes
+            stats_file = src_path/"stats.json"
+            stats_file.write_text(json.dumps({
+                "pkg/small.py": {"size": 6, "time": 10.0},
+                "pkg/large.py": {"size": 6000, "time": 0.001}}))
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertTrue(pyc_wheel.compile_sources(src_path, ddir="<pkg>",
+                                                          stats=stats_file))
+            self.assertEqual([line.split()[1].strip("'.") for line in stdout.getvalue()
+                              .splitlines() if line.startswith("Compiling")],
+                             [str(src_path/"pkg"/"small.py"), str(src_path/"other.py"),
+                              str(src_path/"pkg"/"large.py")])
+            self.assertEqual(set(json.loads(stats_file.read_text())),
+                             {"pkg/small.py", "pkg/large.py", "other.py"})
+        finally:
+            self.rmdir(src_path)
+
+    def test_mmap_bad_wheel(self):
+        whl_file = self.data_dir/"bad-1.0-py3-none-any.whl"
+        whl_file.write_bytes(b"PK\x03\x04bad")
+        with self.assertRaises(zipfile.BadZipFile):
+            main([str(whl_file), "--quiet", "--mmap"])
+
     def test_exclude(self):
         whl_file = self.data_dir/"let3-1.2.3-py3-none-any.whl"
         main([str(whl_file), "--exclude", r"_le?\.py"])
         self.assertTrue(whl_file.exists())
 
+    def test_exclude_matching_directory(self):
+        tests_dir = self.data_dir/"tests_dir"
+        self.mkdir(tests_dir)
+        whl_file = tests_dir/"renumerate-1.3.5-py3-none-any.whl"
+        shutil.copy2(data_dir/whl_file.name, whl_file)
+        main([str(whl_file), "--quiet", "--exclude", r"tests|^renumerate/__about__\.py$"])
+        with zipfile.ZipFile(whl_file) as whl_zip:
+            names = whl_zip.namelist()
+        self.assertIn("renumerate/__init__.pyc", names)
+        self.assertNotIn("renumerate/__init__.py", names)
+        self.assertIn("renumerate/__about__.py", names)
+        self.assertNotIn("renumerate/__about__.pyc", names)
+
     def test_exclude_all(self):
         whl_file = self.data_dir/"let3-1.2.3-py3-none-any_exclude_all.whl"
         main([str(whl_file), "--exclude", r".+"])